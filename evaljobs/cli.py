@@ -1,18 +1,141 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import json
 import os
 import sys
-import tempfile
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from huggingface_hub import run_uv_job, HfApi
 
-from .dataset import (
-    ensure_dataset_exists,
-    create_dataset_readme,
-)
-from .docker_space import create_docker_space
+
+FLAVORS = frozenset({
+    "cpu-basic",
+    "cpu-upgrade",
+    "cpu-xl",
+    "t4-small",
+    "t4-medium",
+    "l4x1",
+    "l4x4",
+    "a10g-small",
+    "a10g-large",
+    "a10g-largex2",
+    "a10g-largex4",
+    "a100-large",
+    "h100",
+    "h100x8",
+})
+
+# The runner ships with the package and is uploaded unchanged on every run
+RUNNER_BYTES = (Path(__file__).parent / "runner.py").read_bytes()
+
+VALUE_OPTIONS = ("--model", "--name", "--limit", "--flavor", "--timeout")
+FLAG_OPTIONS = ("--quiet",)
+
+# Passed through to the runner but not understood by inspect itself
+RUNNER_FLAGS = ("--isolated",)
+
+README_TEMPLATE = """---
+title: {title}
+emoji: 📊
+colorFrom: blue
+colorTo: purple
+sdk: docker
+sdk_version: "latest"
+pinned: false
+---
+
+# {eval_name}
+
+This eval was run using [evaljobs](https://github.com/dvsrepo/evaljobs).
+
+## Command
+
+```bash
+{evaljobs_cmd}
+```
+
+## Run with other models
+
+To run this eval with a different model, use:
+
+```bash
+evaljobs {script_ref} \\
+  --model <your-model> \\
+  --name <your-name> \\
+  --flavor {flavor}
+```
+
+## Inspect eval command
+
+The eval was executed with:
+
+```bash
+{inspect_cmd}
+```
+"""
+
+
+def get_username_cache_path(hf_token):
+    cache_dir = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "evaljobs"
+    token_key = hashlib.sha256(hf_token.encode()).hexdigest()[:16]
+    return cache_dir / f"whoami-{token_key}.json"
+
+
+def get_username(api, hf_token):
+    # whoami is stable per token, so cache it to skip a round-trip on later runs
+    cache_path = get_username_cache_path(hf_token)
+
+    try:
+        return json.loads(cache_path.read_text())["name"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    username = api.whoami()["name"]
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps({"name": username}))
+        os.chmod(cache_path, 0o600)
+    except OSError:
+        pass
+
+    return username
+
+
+def forget_stale_username(api, hf_token, username):
+    # A cached username can go stale (e.g. after an account rename); check it
+    # against whoami and drop the cache entry if it no longer matches. Only a
+    # confirmed mismatch is reported, if whoami fails too the entry is dropped
+    # quietly since re-running may not help.
+    try:
+        stale = api.whoami()["name"] != username
+    except Exception:
+        get_username_cache_path(hf_token).unlink(missing_ok=True)
+        return False
+
+    if stale:
+        get_username_cache_path(hf_token).unlink(missing_ok=True)
+    return stale
+
+
+def format_extra_args(extra_args):
+    # One line per flag, keeping a flag and its value together
+    lines = []
+    i = 0
+    while i < len(extra_args):
+        arg = extra_args[i]
+        if (
+            arg.startswith("--")
+            and i + 1 < len(extra_args)
+            and not extra_args[i + 1].startswith("--")
+        ):
+            lines.append(f"  {arg} {extra_args[i + 1]}")
+            i += 2
+        else:
+            lines.append(f"  {arg}")
+            i += 1
+    return lines
 
 
 def generate_readme_commands(args, extra_args, eval_ref, is_inspect_evals, is_from_space, space_id):
@@ -26,20 +149,7 @@ def generate_readme_commands(args, extra_args, eval_ref, is_inspect_evals, is_fr
     if args.limit:
         cmd_lines.append(f"  --limit {args.limit}")
 
-    if extra_args:
-        i = 0
-        while i < len(extra_args):
-            arg = extra_args[i]
-            if (
-                arg.startswith("--")
-                and i + 1 < len(extra_args)
-                and not extra_args[i + 1].startswith("--")
-            ):
-                cmd_lines.append(f"  {arg} {extra_args[i + 1]}")
-                i += 2
-            else:
-                cmd_lines.append(f"  {arg}")
-                i += 1
+    cmd_lines.extend(format_extra_args(extra_args))
 
     evaljobs_cmd = " \\\n".join(cmd_lines)
 
@@ -53,20 +163,9 @@ def generate_readme_commands(args, extra_args, eval_ref, is_inspect_evals, is_fr
     inspect_cmd_lines.append("  --log-shared")
     inspect_cmd_lines.append("  --log-buffer 100")
 
-    if extra_args:
-        i = 0
-        while i < len(extra_args):
-            arg = extra_args[i]
-            if (
-                arg.startswith("--")
-                and i + 1 < len(extra_args)
-                and not extra_args[i + 1].startswith("--")
-            ):
-                inspect_cmd_lines.append(f"  {arg} {extra_args[i + 1]}")
-                i += 2
-            else:
-                inspect_cmd_lines.append(f"  {arg}")
-                i += 1
+    inspect_cmd_lines.extend(
+        format_extra_args([arg for arg in extra_args if arg not in RUNNER_FLAGS])
+    )
 
     inspect_cmd = " \\\n".join(inspect_cmd_lines)
 
@@ -95,82 +194,117 @@ def generate_readme(args, extra_args, eval_ref, is_inspect_evals, is_from_space,
         eval_name = args.name
         title = args.name
 
-    readme_content = f"""---
-title: {title}
-emoji: 📊
-colorFrom: blue
-colorTo: purple
-sdk: docker
-sdk_version: "latest"
-pinned: false
----
-
-# {eval_name}
-
-This eval was run using [evaljobs](https://github.com/dvsrepo/evaljobs).
-
-## Command
-
-```bash
-{evaljobs_cmd}
-```
-
-## Run with other models
-
-To run this eval with a different model, use:
-
-```bash
-evaljobs {script_ref} \\
-  --model <your-model> \\
-  --name <your-name> \\
-  --flavor {args.flavor}
-```
-
-## Inspect eval command
-
-The eval was executed with:
-
-```bash
-{inspect_cmd}
-```
-"""
+    readme_content = README_TEMPLATE.format(
+        title=title,
+        eval_name=eval_name,
+        evaljobs_cmd=evaljobs_cmd,
+        script_ref=script_ref,
+        flavor=args.flavor,
+        inspect_cmd=inspect_cmd,
+    )
 
     return readme_content
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("script")
     parser.add_argument("--model", required=True)
     parser.add_argument("--name", required=True)
     parser.add_argument("--limit", type=int)
-    parser.add_argument(
-        "--flavor",
-        default="cpu-basic",
-        choices=[
-            "cpu-basic",
-            "cpu-upgrade",
-            "cpu-xl",
-            "t4-small",
-            "t4-medium",
-            "l4x1",
-            "l4x4",
-            "a10g-small",
-            "a10g-large",
-            "a10g-largex2",
-            "a10g-largex4",
-            "a100-large",
-            "h100",
-            "h100x8",
-        ],
-    )
+    parser.add_argument("--flavor", default="cpu-basic")
     parser.add_argument("--timeout", default="30m")
+    parser.add_argument("--quiet", action="store_true")
+    return parser
+
+
+def parse_args_fast(argv):
+    # Single pass over argv for the common case. Returns None for anything
+    # unusual (help, missing or invalid values, abbreviated options) so that
+    # argparse can handle it and report errors.
+    if "-h" in argv or "--help" in argv:
+        return None
+
+    values = {}
+    quiet = False
+    script = None
+    extra_args = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        option, has_value, inline_value = arg.partition("=")
+        if option in VALUE_OPTIONS:
+            if has_value:
+                values[option] = inline_value
+                i += 1
+            elif i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                values[option] = argv[i + 1]
+                i += 2
+            else:
+                return None
+        elif arg in FLAG_OPTIONS:
+            quiet = True
+            i += 1
+        elif arg.startswith("-"):
+            if any(
+                known.startswith(option) for known in VALUE_OPTIONS + FLAG_OPTIONS
+            ):
+                return None
+            extra_args.append(arg)
+            i += 1
+        elif script is None:
+            script = arg
+            i += 1
+        else:
+            extra_args.append(arg)
+            i += 1
+
+    if script is None or "--model" not in values or "--name" not in values:
+        return None
+
+    flavor = values.get("--flavor", "cpu-basic")
+    if flavor not in FLAVORS:
+        return None
+
+    limit = values.get("--limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return None
+
+    args = argparse.Namespace(
+        script=script,
+        model=values["--model"],
+        name=values["--name"],
+        limit=limit,
+        flavor=flavor,
+        timeout=values.get("--timeout", "30m"),
+        quiet=quiet,
+    )
+    return args, extra_args
+
 
-    args, extra_args = parser.parse_known_args()
+def main():
+    parsed = parse_args_fast(sys.argv[1:])
+    if parsed is None:
+        parser = build_parser()
+        parsed = parser.parse_known_args()
+        if parsed[0].flavor not in FLAVORS:
+            parser.error(
+                f"argument --flavor: invalid choice: '{parsed[0].flavor}' "
+                f"(choose from {', '.join(sorted(FLAVORS))})"
+            )
+    args, extra_args = parsed
+
+    def log(message):
+        if not args.quiet:
+            print(message)
 
     is_inspect_evals = args.script.startswith("inspect_evals/")
-    is_local_file = Path(args.script).exists()
     is_http_url = args.script.startswith("http")
+    # Only stat the filesystem when the string checks haven't already decided
+    is_local_file = not is_inspect_evals and not is_http_url and Path(args.script).exists()
     is_space_ref = "/" in args.script and not is_http_url and not is_inspect_evals and not is_local_file
 
     if (
@@ -187,35 +321,29 @@ def main():
         print("Error: HF_TOKEN environment variable not set", file=sys.stderr)
         sys.exit(1)
 
+    # Imported here so --help and argument errors don't pay for huggingface_hub
+    from huggingface_hub import run_uv_job, CommitOperationAdd, HfApi, get_session
+
+    from .dataset import (
+        ensure_dataset_exists,
+        create_dataset_readme,
+    )
+    from .docker_space import create_docker_space
+    from .hub import drop_unchanged
+    from huggingface_hub.utils import HfHubHTTPError
+
+    username = None
+    username_was_cached = get_username_cache_path(hf_token).exists()
+
     try:
         api = HfApi(token=hf_token)
-        user_info = api.whoami()
-        username = user_info["name"]
+        username = get_username(api, hf_token)
 
         dataset_repo = f"datasets/{username}/{args.name}"
         space_id = f"{username}/{args.name}"
 
-        print("Setting up dataset...")
-        dataset_repo = ensure_dataset_exists(
-            dataset_repo=dataset_repo,
-            hf_token=hf_token,
-        )
-
-        print("Creating space...")
-        if is_inspect_evals:
-            eval_name = args.script.replace("inspect_evals/", "")
-            space_title = f"Inspect Evals/{eval_name}"
-        else:
-            space_title = args.name
-        
-        create_docker_space(
-            space_id=space_id,
-            dataset_repo=dataset_repo,
-            hf_token=hf_token,
-            title=space_title,
-        )
-
-        print("Uploading files...")
+        log("Preparing eval files...")
+        operations = []
 
         if is_inspect_evals:
             eval_ref = args.script
@@ -227,109 +355,139 @@ def main():
             else:
                 source_space_id = args.script
 
-            try:
-                files = api.list_repo_files(repo_id=source_space_id, repo_type="space")
-            except Exception as e:
-                print(
-                    f"✗ Error: Could not access Space {source_space_id}: {e}",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
-
-            eval_files = [
-                f for f in files if f.startswith("eval") and f.endswith(".py")
-            ]
-
-            if not eval_files:
-                print(
-                    f"✗ Error: No eval script found in Space {source_space_id}",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
+            # Reuse huggingface_hub's pooled session so the download shares the
+            # keep-alive connection to huggingface.co with the HfApi calls.
+            session = get_session()
 
-            source_eval_url = f"https://huggingface.co/spaces/{source_space_id}/resolve/main/{eval_files[0]}"
-
-            with urllib.request.urlopen(source_eval_url) as response:
-                eval_content = response.read()
-
-            with tempfile.NamedTemporaryFile(
-                mode="wb", suffix=".py", delete=False
-            ) as tmp:
-                tmp.write(eval_content)
-                tmp_path = tmp.name
-
-            api.upload_file(
-                path_or_fileobj=tmp_path,
-                path_in_repo="eval.py",
-                repo_id=space_id,
-                repo_type="space",
+            # Spaces created by evaljobs store their script as eval.py, so try it
+            # directly and only list the Space's files when it isn't there.
+            response = session.get(
+                f"https://huggingface.co/spaces/{source_space_id}/resolve/main/eval.py"
+            )
+            if response.status_code != 200:
+                try:
+                    files = api.list_repo_files(repo_id=source_space_id, repo_type="space")
+                except Exception as e:
+                    print(
+                        f"✗ Error: Could not access Space {source_space_id}: {e}",
+                        file=sys.stderr,
+                    )
+                    sys.exit(1)
+
+                eval_files = [
+                    f for f in files if f.startswith("eval") and f.endswith(".py")
+                ]
+
+                if not eval_files:
+                    print(
+                        f"✗ Error: No eval script found in Space {source_space_id}",
+                        file=sys.stderr,
+                    )
+                    sys.exit(1)
+
+                source_eval_url = f"https://huggingface.co/spaces/{source_space_id}/resolve/main/{eval_files[0]}"
+                response = session.get(source_eval_url)
+                response.raise_for_status()
+
+            operations.append(
+                CommitOperationAdd(path_in_repo="eval.py", path_or_fileobj=response.content)
             )
-            os.unlink(tmp_path)
             eval_ref = f"https://huggingface.co/spaces/{space_id}/resolve/main/eval.py"
         else:
-            # For local files, upload as eval.py to destination Space
-            api.upload_file(
-                path_or_fileobj=args.script,
-                path_in_repo="eval.py",
-                repo_id=space_id,
-                repo_type="space",
+            # For local files, upload as eval.py to destination Space. Reading the
+            # bytes once lets hashing and upload share the same buffer.
+            operations.append(
+                CommitOperationAdd(
+                    path_in_repo="eval.py",
+                    path_or_fileobj=Path(args.script).read_bytes(),
+                )
             )
             eval_ref = f"https://huggingface.co/spaces/{space_id}/resolve/main/eval.py"
 
-        runner_path = Path(__file__).parent / "runner.py"
-        api.upload_file(
-            path_or_fileobj=str(runner_path),
-            path_in_repo="runner.py",
-            repo_id=space_id,
-            repo_type="space",
+        operations.append(
+            CommitOperationAdd(path_in_repo="runner.py", path_or_fileobj=RUNNER_BYTES)
         )
         runner_url = f"https://huggingface.co/spaces/{space_id}/resolve/main/runner.py"
 
         evaljobs_cmd, inspect_cmd, script_ref = generate_readme_commands(
             args, extra_args, eval_ref, is_inspect_evals, is_http_url or is_space_ref, space_id
         )
-        
-        create_dataset_readme(
-            dataset_repo=dataset_repo,
-            hf_token=hf_token,
-            name=args.name,
-            model=args.model,
-            space_id=space_id,
-            script=args.script,
-            is_inspect_evals=is_inspect_evals,
-            evaljobs_cmd=evaljobs_cmd,
-            inspect_cmd=inspect_cmd,
-            script_ref=script_ref,
-            flavor=args.flavor,
-        )
-
         readme_content = generate_readme(
             args, extra_args, eval_ref, is_inspect_evals, is_http_url or is_space_ref, space_id
         )
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".md", delete=False, encoding="utf-8"
-        ) as tmp:
-            tmp.write(readme_content)
-            tmp_path = tmp.name
-
-        api.upload_file(
-            path_or_fileobj=tmp_path,
-            path_in_repo="README.md",
-            repo_id=space_id,
-            repo_type="space",
+        operations.append(
+            CommitOperationAdd(
+                path_in_repo="README.md",
+                path_or_fileobj=readme_content.encode("utf-8"),
+            )
         )
-        os.unlink(tmp_path)
 
-        print("Submitting job...")
-        script_args = [eval_ref, args.model, dataset_repo]
         if is_inspect_evals:
-            script_args.append("--inspect-evals")
+            eval_name = args.script.replace("inspect_evals/", "")
+            space_title = f"Inspect Evals/{eval_name}"
+        else:
+            space_title = args.name
 
-        if args.limit:
-            script_args.extend(["--limit", str(args.limit)])
+        def set_up_dataset():
+            ensure_dataset_exists(
+                dataset_repo=dataset_repo,
+                hf_token=hf_token,
+                api=api,
+            )
+            create_dataset_readme(
+                dataset_repo=dataset_repo,
+                hf_token=hf_token,
+                name=args.name,
+                model=args.model,
+                space_id=space_id,
+                script=args.script,
+                is_inspect_evals=is_inspect_evals,
+                evaljobs_cmd=evaljobs_cmd,
+                inspect_cmd=inspect_cmd,
+                script_ref=script_ref,
+                flavor=args.flavor,
+                api=api,
+            )
 
-        if extra_args:
-            script_args.extend(extra_args)
+        def set_up_space():
+            create_docker_space(
+                space_id=space_id,
+                dataset_repo=dataset_repo,
+                hf_token=hf_token,
+                title=space_title,
+                api=api,
+                upload_readme=False,
+            )
+
+            # One preupload + commit round-trip for all Space files that changed
+            changed = drop_unchanged(
+                api, repo_id=space_id, repo_type="space", operations=operations
+            )
+            if changed:
+                api.create_commit(
+                    repo_id=space_id,
+                    repo_type="space",
+                    operations=changed,
+                    commit_message="Upload eval files with evaljobs",
+                )
+
+        # The dataset and Space chains are independent, so overlap their round-trips
+        log("Setting up dataset and space...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            dataset_future = executor.submit(set_up_dataset)
+            space_future = executor.submit(set_up_space)
+            dataset_future.result()
+            space_future.result()
+
+        log("Submitting job...")
+        script_args = [
+            eval_ref,
+            args.model,
+            dataset_repo,
+            *(["--inspect-evals"] if is_inspect_evals else []),
+            *(["--limit", str(args.limit)] if args.limit else []),
+            *extra_args,
+        ]
 
         job_info = run_uv_job(
             script=runner_url,
@@ -337,6 +495,12 @@ def main():
             flavor=args.flavor,
             timeout=args.timeout,
             secrets={"HF_TOKEN": hf_token},
+            # Forward the runner's partial-export interval when set locally
+            env={
+                key: os.environ[key]
+                for key in ("EVALJOBS_EXPORT_INTERVAL",)
+                if key in os.environ
+            },
         )
 
         repo_id = dataset_repo.replace("datasets/", "")
@@ -347,6 +511,18 @@ def main():
 
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
+        if (
+            username_was_cached
+            and username is not None
+            and isinstance(e, HfHubHTTPError)
+            and e.response is not None
+            and e.response.status_code in (401, 403, 404)
+            and forget_stale_username(api, hf_token, username)
+        ):
+            print(
+                "Cached username was out of date and has been cleared, please re-run",
+                file=sys.stderr,
+            )
         sys.exit(1)
 
 
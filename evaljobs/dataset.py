@@ -1,13 +1,16 @@
-import io
 from pathlib import Path
-from huggingface_hub import HfApi
+from typing import Optional
+from huggingface_hub import CommitOperationAdd, HfApi
+
+from .hub import drop_unchanged
 
 
 def ensure_dataset_exists(
     dataset_repo: str,
     hf_token: str,
+    api: Optional[HfApi] = None,
 ) -> str:
-    api = HfApi(token=hf_token)
+    api = api or HfApi(token=hf_token)
 
     repo_id = (
         dataset_repo.replace("datasets/", "")
@@ -15,25 +18,11 @@ def ensure_dataset_exists(
         else dataset_repo
     )
 
-    try:
-        api.repo_info(repo_id=repo_id, repo_type="dataset")
-    except Exception:
-        api.create_repo(
-            repo_id=repo_id,
-            repo_type="dataset",
-            exist_ok=False,
-        )
-
-    try:
-        api.upload_file(
-            path_or_fileobj=io.BytesIO(b"# This file ensures the logs directory exists\n"),
-            path_in_repo="logs/.gitkeep",
-            repo_id=repo_id,
-            repo_type="dataset",
-            token=hf_token,
-        )
-    except Exception:
-        pass
+    api.create_repo(
+        repo_id=repo_id,
+        repo_type="dataset",
+        exist_ok=True,
+    )
 
     return dataset_repo
 
@@ -57,8 +46,9 @@ def create_dataset_readme(
     inspect_cmd: str,
     script_ref: str,
     flavor: str,
+    api: Optional[HfApi] = None,
 ) -> None:
-    api = HfApi(token=hf_token)
+    api = api or HfApi(token=hf_token)
 
     repo_id = (
         dataset_repo.replace("datasets/", "")
@@ -139,10 +129,29 @@ samples = load_dataset('{repo_id}', split='samples')
 ```
 """
 
-    api.upload_file(
-        path_or_fileobj=io.BytesIO(readme_content.encode("utf-8")),
-        path_in_repo="README.md",
+    # The logs directory marker goes in the same commit as the README
+    operations = drop_unchanged(
+        api,
+        repo_id=repo_id,
+        repo_type="dataset",
+        operations=[
+            CommitOperationAdd(
+                path_in_repo="README.md",
+                path_or_fileobj=readme_content.encode("utf-8"),
+            ),
+            CommitOperationAdd(
+                path_in_repo="logs/.gitkeep",
+                path_or_fileobj=b"# This file ensures the logs directory exists\n",
+            ),
+        ],
+    )
+    if not operations:
+        return
+
+    api.create_commit(
         repo_id=repo_id,
         repo_type="dataset",
+        operations=operations,
+        commit_message="Set up evaljobs dataset",
         token=hf_token,
     )
@@ -1,5 +1,4 @@
-import os
-import tempfile
+import io
 from typing import Optional
 from huggingface_hub import HfApi
 
@@ -36,8 +35,10 @@ def create_docker_space(
     hf_token: str,
     title: Optional[str] = None,
     template_space: str = "dvilasuero/evaljobs_docker_template",
+    api: Optional[HfApi] = None,
+    upload_readme: bool = True,
 ) -> str:
-    api = HfApi(token=hf_token)
+    api = api or HfApi(token=hf_token)
 
     log_dir = f"hf://{dataset_repo}/logs"
 
@@ -58,41 +59,27 @@ def create_docker_space(
             token=hf_token,
         )
 
-    try:
-        api.add_space_variable(
-            repo_id=space_id,
-            key="LOG_DIR",
-            value=log_dir,
-        )
-    except Exception:
-        api.delete_space_variable(repo_id=space_id, key="LOG_DIR")
-        api.add_space_variable(
-            repo_id=space_id,
-            key="LOG_DIR",
-            value=log_dir,
-        )
-
-    readme_content = README_TEMPLATE.format(
-        title=title,
-        dataset_repo=dataset_repo.replace("datasets/", ""),
-        log_dir=log_dir,
+    # add_space_variable creates or updates the variable in a single request
+    api.add_space_variable(
+        repo_id=space_id,
+        key="LOG_DIR",
+        value=log_dir,
     )
 
-    with tempfile.NamedTemporaryFile(
-        mode="w", suffix=".md", delete=False, encoding="utf-8"
-    ) as tmp:
-        tmp.write(readme_content)
-        readme_path = tmp.name
+    # Callers that commit their own README skip this one to avoid an extra
+    # commit (and Space rebuild) that would be overwritten straight away
+    if upload_readme:
+        readme_content = README_TEMPLATE.format(
+            title=title,
+            dataset_repo=dataset_repo.replace("datasets/", ""),
+            log_dir=log_dir,
+        )
 
-    try:
         api.upload_file(
-            path_or_fileobj=readme_path,
+            path_or_fileobj=io.BytesIO(readme_content.encode("utf-8")),
             path_in_repo="README.md",
             repo_id=space_id,
             repo_type="space",
         )
-    finally:
-        if os.path.exists(readme_path):
-            os.unlink(readme_path)
 
     return space_id
@@ -0,0 +1,43 @@
+import hashlib
+from typing import List
+from huggingface_hub import CommitOperationAdd, HfApi
+
+
+# evaljobs/runner.py carries a copy of these helpers since it runs standalone
+# on the job; keep the two in sync
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def is_unchanged(operation: CommitOperationAdd, remote_file) -> bool:
+    lfs = getattr(remote_file, "lfs", None)
+    if lfs:
+        return lfs.sha256 == operation.upload_info.sha256.hex()
+
+    with operation.as_file() as f:
+        return getattr(remote_file, "blob_id", None) == git_blob_sha(f.read())
+
+
+def drop_unchanged(
+    api: HfApi,
+    repo_id: str,
+    repo_type: str,
+    operations: List[CommitOperationAdd],
+) -> List[CommitOperationAdd]:
+    # Skip files whose content already matches the repo, so re-runs avoid the
+    # preupload and, when nothing changed, the commit entirely
+    try:
+        remote_files = api.get_paths_info(
+            repo_id=repo_id,
+            paths=[op.path_in_repo for op in operations],
+            repo_type=repo_type,
+        )
+    except Exception:
+        return operations
+
+    remote = {f.path: f for f in remote_files}
+    return [
+        op
+        for op in operations
+        if op.path_in_repo not in remote or not is_unchanged(op, remote[op.path_in_repo])
+    ]
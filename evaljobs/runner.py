@@ -10,28 +10,115 @@
 #     "huggingface_hub",
 #     "inspect-evals",
 #     "pandas",
-#     "pyarrow",
+#     "pyarrow>=21.0.0",
+#     "requests",
 # ]
 # ///
 
+import functools
+import hashlib
 import os
+import shutil
 import sys
 import subprocess
 import tempfile
-import urllib.request
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Let hf_xet use all available bandwidth for the parquet uploads. Must be set
+# before huggingface_hub is imported; set HF_XET_HIGH_PERFORMANCE=0 to opt out
+# on constrained uplinks.
+os.environ.setdefault("HF_XET_HIGH_PERFORMANCE", "1")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
 from inspect_ai.analysis import evals_df, samples_df
 
+# Exports are reloaded whole with load_dataset, so prefer few large row groups.
+# Set explicitly so incremental writers don't fall back to tiny per-chunk groups.
+PARQUET_ROW_GROUP_SIZE = 128 * 1024
 
-def export_logs_to_parquet(log_dir: str, dataset_repo: str) -> None:
+# Seconds between partial parquet exports while the eval runs (0 disables them)
+EXPORT_INTERVAL = float(os.getenv("EVALJOBS_EXPORT_INTERVAL", "300"))
+
+
+def to_parquet_bytes(df) -> bytes:
+    # Write through Arrow directly to pick compression and encoding ourselves;
+    # zstd + dictionary encoding compresses the string-heavy log columns well.
+    # Frames assembled from many logs can convert to many small chunks;
+    # combine them so the writer isn't paying per-chunk overhead.
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    buffer = pa.BufferOutputStream()
+    pq.write_table(
+        table,
+        buffer,
+        row_group_size=PARQUET_ROW_GROUP_SIZE,
+        compression="zstd",
+        compression_level=3,
+        use_dictionary=True,
+        data_page_version="2.0",
+        write_statistics=True,
+        # Page indexes and content-defined chunking let readers (and the Hub's
+        # dedup) skip pages that haven't changed
+        write_page_index=True,
+        use_content_defined_chunking=True,
+    )
+    return buffer.getvalue().to_pybytes()
+
+
+@functools.lru_cache(maxsize=None)
+def get_api():
+    # One client for every export so repeated uploads share pooled connections
     from huggingface_hub import HfApi
 
     hf_token = os.getenv("HF_TOKEN")
     if not hf_token:
         raise ValueError("HF_TOKEN environment variable not set")
 
-    api = HfApi(token=hf_token)
+    return HfApi(token=hf_token)
+
+
+# git_blob_sha, is_unchanged and drop_unchanged are copies of evaljobs/hub.py
+# (this script runs standalone on the job); keep the two in sync
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def is_unchanged(operation, remote_file) -> bool:
+    lfs = getattr(remote_file, "lfs", None)
+    if lfs:
+        return lfs.sha256 == operation.upload_info.sha256.hex()
+
+    with operation.as_file() as f:
+        return getattr(remote_file, "blob_id", None) == git_blob_sha(f.read())
+
+
+def drop_unchanged(api, repo_id: str, repo_type: str, operations: list) -> list:
+    # Skip files whose content already matches the repo, so re-runs avoid the
+    # preupload and, when nothing changed, the commit entirely
+    try:
+        remote_files = api.get_paths_info(
+            repo_id=repo_id,
+            paths=[op.path_in_repo for op in operations],
+            repo_type=repo_type,
+        )
+    except Exception:
+        return operations
+
+    remote = {f.path: f for f in remote_files}
+    return [
+        op
+        for op in operations
+        if op.path_in_repo not in remote or not is_unchanged(op, remote[op.path_in_repo])
+    ]
+
+
+def export_logs_to_parquet(log_dir: str, dataset_repo: str) -> None:
+    from huggingface_hub import CommitOperationAdd
+
+    api = get_api()
 
     repo_id = (
         dataset_repo.replace("datasets/", "")
@@ -39,36 +126,157 @@ def export_logs_to_parquet(log_dir: str, dataset_repo: str) -> None:
         else dataset_repo
     )
 
-    evals = evals_df(logs=log_dir)
-    samples = samples_df(logs=log_dir)
+    # Both scans are network-bound reads of the same log dir; overlap them.
+    # quiet=True keeps them from opening competing rich live displays.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        evals_future = executor.submit(evals_df, logs=log_dir, quiet=True)
+        samples_future = executor.submit(samples_df, logs=log_dir, quiet=True)
+        evals = evals_future.result()
+        samples = samples_future.result()
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        evals_path = Path(tmpdir) / "evals.parquet"
-        samples_path = Path(tmpdir) / "samples.parquet"
+    # Parquet is built in memory and uploaded from there, with no temp files
+    operations = drop_unchanged(
+        api,
+        repo_id=repo_id,
+        repo_type="dataset",
+        operations=[
+            CommitOperationAdd(
+                path_in_repo="evals.parquet",
+                path_or_fileobj=to_parquet_bytes(evals),
+            ),
+            CommitOperationAdd(
+                path_in_repo="samples.parquet",
+                path_or_fileobj=to_parquet_bytes(samples),
+            ),
+        ],
+    )
+    if not operations:
+        return
 
-        evals.to_parquet(evals_path, index=False, engine="pyarrow")
-        samples.to_parquet(samples_path, index=False, engine="pyarrow")
+    api.create_commit(
+        repo_id=repo_id,
+        repo_type="dataset",
+        operations=operations,
+        commit_message="Publish eval results",
+    )
 
-        api.upload_file(
-            path_or_fileobj=str(evals_path),
-            path_in_repo="evals.parquet",
-            repo_id=repo_id,
-            repo_type="dataset",
-            token=hf_token,
+
+def get_eval_dir() -> Path:
+    # inspect runs the eval from the script's directory, so keep it in a
+    # private directory on regular disk (EVAL_TMPDIR can point it at tmpfs)
+    if os.getenv("EVAL_TMPDIR"):
+        return Path(os.environ["EVAL_TMPDIR"])
+    eval_dir = Path(tempfile.gettempdir()) / "evaljobs"
+    eval_dir.mkdir(mode=0o700, exist_ok=True)
+    return eval_dir
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_session() -> requests.Session:
+    # Keep-alive session for plain HTTP downloads made by the runner
+    return requests.Session()
+
+
+def download_eval_script(eval_ref: str) -> str:
+    # Cache per URL and revalidate with the ETag so re-runs skip the download
+    cache_key = hashlib.sha256(eval_ref.encode()).hexdigest()[:16]
+    eval_path = get_eval_dir() / f"evaljobs_{cache_key}.py"
+    etag_path = eval_path.with_suffix(".etag")
+
+    headers = {}
+    if eval_path.exists() and etag_path.exists():
+        headers["If-None-Match"] = etag_path.read_text()
+
+    # Stream into a unique file and rename it into place so concurrent runners
+    # never see a partially written script
+    fd, tmp_path = tempfile.mkstemp(suffix=".py", dir=eval_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f, get_http_session().get(
+            eval_ref, headers=headers, stream=True
+        ) as response:
+            not_modified = response.status_code == 304
+            if not not_modified:
+                response.raise_for_status()
+                # Reading from raw bypasses requests' automatic decompression of
+                # gzip/deflate responses, so ask urllib3 to decode while streaming
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, f, length=64 * 1024)
+                etag = response.headers.get("ETag")
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    if not_modified:
+        os.unlink(tmp_path)
+        return str(eval_path)
+
+    os.replace(tmp_path, eval_path)
+
+    if etag:
+        etag_path.write_text(etag)
+    else:
+        etag_path.unlink(missing_ok=True)
+
+    return str(eval_path)
+
+
+def load_inspect_cli():
+    # inspect's CLI lives in private modules; if they move, return None so
+    # the runner falls back to the inspect subprocess
+    try:
+        from inspect_ai._cli.main import inspect
+        from inspect_ai._util.dotenv import init_dotenv
+    except ImportError:
+        return None
+
+    init_dotenv()
+    return inspect
+
+
+def run_inspect(args: list, inspect_cli) -> None:
+    if inspect_cli is None:
+        # Separate interpreter with unbuffered output so logs stream live
+        subprocess.run(
+            ["inspect", *args],
+            check=True,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
         )
+        return
 
-        api.upload_file(
-            path_or_fileobj=str(samples_path),
-            path_in_repo="samples.parquet",
-            repo_id=repo_id,
-            repo_type="dataset",
-            token=hf_token,
+    import click
+
+    # Run inspect's own CLI in-process: extra args parse exactly as on the
+    # command line, without a second interpreter start and inspect import
+    try:
+        exit_code = inspect_cli.main(
+            args=args,
+            prog_name="inspect",
+            auto_envvar_prefix="INSPECT",
+            standalone_mode=False,
         )
+    except click.ClickException as e:
+        # Usage errors surface as exceptions outside standalone mode; report
+        # them the way the inspect command would instead of a traceback
+        e.show()
+        sys.exit(e.exit_code)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def export_periodically(
+    log_dir: str, dataset_repo: str, stop: threading.Event, interval: float
+) -> None:
+    while not stop.wait(interval):
+        print("Exporting partial results to parquet...", flush=True)
+        try:
+            export_logs_to_parquet(log_dir, dataset_repo)
+        except Exception as e:
+            print(f"Warning: Could not export partial results: {e}", flush=True)
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 4:
-        print("Usage: eval_runner.py <eval_ref> <model> <dataset_repo> [--inspect-evals] [extra_args...]")
+        print("Usage: eval_runner.py <eval_ref> <model> <dataset_repo> [--inspect-evals] [--isolated] [extra_args...]", flush=True)
         sys.exit(1)
 
     eval_ref = sys.argv[1]
@@ -76,7 +284,10 @@ if __name__ == "__main__":
     dataset_repo = sys.argv[3]
 
     is_inspect_evals = "--inspect-evals" in sys.argv
-    extra_args = [arg for arg in sys.argv[4:] if arg != "--inspect-evals"]
+    is_isolated = "--isolated" in sys.argv
+    extra_args = [
+        arg for arg in sys.argv[4:] if arg not in ("--inspect-evals", "--isolated")
+    ]
 
     if not dataset_repo.startswith("datasets/"):
         dataset_repo = f"datasets/{dataset_repo}"
@@ -86,58 +297,61 @@ if __name__ == "__main__":
 
     if is_inspect_evals:
         eval_target = eval_ref
-        cleanup_file = None
     else:
-        print("Downloading eval script...")
-        with urllib.request.urlopen(eval_ref) as response:
-            eval_code = response.read().decode("utf-8")
+        print("Downloading eval script...", flush=True)
+        eval_target = download_eval_script(eval_ref)
 
-        eval_filename = "downloaded_eval.py"
-        with open(eval_filename, "w") as f:
-            f.write(eval_code)
+    if is_eval_set:
+        print("Running evaluation set...", flush=True)
+        cmd = [
+            "eval-set",
+            eval_target,
+            "--model",
+            model,
+            "--log-dir",
+            log_dir,
+            "--log-shared",
+            "--log-buffer",
+            "100",
+        ]
+    else:
+        print("Running evaluation...", flush=True)
+        cmd = [
+            "eval",
+            eval_target,
+            "--model",
+            model,
+            "--log-dir",
+            log_dir,
+            "--log-shared",
+            "--log-buffer",
+            "100",
+        ]
+    cmd.extend(extra_args)
 
-        eval_target = eval_filename
-        cleanup_file = eval_filename
+    inspect_cli = None if is_isolated else load_inspect_cli()
+    if inspect_cli is None and not is_isolated:
+        print("Warning: inspect CLI not importable, running it as a subprocess", flush=True)
 
+    # Publish partial results while inspect runs so the final export has
+    # less to catch up on
+    stop_export = threading.Event()
+    exporter = threading.Thread(
+        target=export_periodically,
+        args=(log_dir, dataset_repo, stop_export, EXPORT_INTERVAL),
+        daemon=True,
+    )
+    if EXPORT_INTERVAL > 0:
+        exporter.start()
     try:
-        if is_eval_set:
-            print("Running evaluation set...")
-            cmd = [
-                "inspect",
-                "eval-set",
-                eval_target,
-                "--model",
-                model,
-                "--log-dir",
-                log_dir,
-                "--log-shared",
-                "--log-buffer",
-                "100",
-            ]
-        else:
-            print("Running evaluation...")
-            cmd = [
-                "inspect",
-                "eval",
-                eval_target,
-                "--model",
-                model,
-                "--log-dir",
-                log_dir,
-                "--log-shared",
-                "--log-buffer",
-                "100",
-            ]
-        cmd.extend(extra_args)
-
-        subprocess.run(cmd, check=True)
-
-        print("Exporting logs to parquet...")
-        try:
-            export_logs_to_parquet(log_dir, dataset_repo)
-        except Exception as e:
-            print(f"Warning: Could not export to parquet: {e}")
-
+        run_inspect(cmd, inspect_cli)
     finally:
-        if cleanup_file and os.path.exists(cleanup_file):
-            os.unlink(cleanup_file)
+        stop_export.set()
+        if exporter.is_alive():
+            exporter.join()
+
+    print("Exporting logs to parquet...", flush=True)
+    try:
+        export_logs_to_parquet(log_dir, dataset_repo)
+    except Exception as e:
+        print(f"Warning: Could not export to parquet: {e}", flush=True)
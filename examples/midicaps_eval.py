@@ -25,10 +25,11 @@ def midicaps_eval():
 
 
 def record_to_sample(record: dict[str, Any]) -> Sample:
+    # Fields are known-good strings, so skip pydantic validation per record
     message = [
-        ChatMessageUser(
+        ChatMessageUser.model_construct(
             content=[
-                ContentText(text=record['caption']),
+                ContentText.model_construct(text=record['caption']),
             ]
         )
     ]